@@ -2,135 +2,456 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 import datetime
-import matplotlib.pyplot as plt
-from scipy.stats import gmean
+import os
+import time
+import pickle
+import threading
+import functools
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Endpoint JSON Yahoo Finance yang juga dipakai yfinance untuk data rasio.
+# quoteSummary membutuhkan cookie (dari fc.yahoo.com) dan parameter crumb.
+_YAHOO_COOKIE_URL = "https://fc.yahoo.com"
+_YAHOO_CRUMB_URL = "https://query2.finance.yahoo.com/v1/test/getcrumb"
+_QUOTE_SUMMARY_URL = "https://query2.finance.yahoo.com/v10/finance/quoteSummary/{ticker}"
+_QUOTE_SUMMARY_MODULES = "defaultKeyStatistics,financialData,summaryDetail"
+
+# Batas waktu (detik) per request async sebelum jatuh ke yfinance
+_ASYNC_TIMEOUT = 10
+
+# Rasio market multiples beserta kunci info Yahoo Finance-nya,
+# dan penanda rasio berbasis Enterprise Value
+_METRIC_KEYS = {
+    'P/E': 'trailingPE',
+    'P/BV': 'priceToBook',
+    'EV/EBITDA': 'enterpriseToEbitda',
+    'EV/Sales': 'enterpriseToRevenue'
+}
+_MULTIPLES = tuple(_METRIC_KEYS)
+_IS_EV = np.array([False, False, True, True])
+
+# Kunci hasil valuasi yang bukan nilai per saham
+_NON_METRIC = frozenset({'ticker', 'current_price', 'company_name'})
+
+# Cache rasio dari quoteSummary per ticker, terpisah dari cache get_info karena isinya
+# hanya sebagian dari Ticker.info (None berarti quoteSummary gagal untuk ticker itu)
+_summary_cache = {}
+
+# Cache di disk untuk data yang sudah diekstrak (bukan respons HTTP mentah) sehingga
+# run berikutnya untuk ticker yang sama tidak perlu mengunduh ulang
+_DISK_CACHE_DIR = '.yf_cache'
+_DISK_CACHE_TTL = datetime.timedelta(hours=12)
+
+# Field harga real-time dari info yang tidak disimpan ke cache disk agar tidak basi
+_QUOTE_FIELDS = frozenset({
+    'currentPrice', 'regularMarketPrice', 'regularMarketOpen', 'regularMarketDayHigh',
+    'regularMarketDayLow', 'regularMarketVolume', 'open', 'dayHigh', 'dayLow', 'volume', 'bid', 'ask'
+})
+
+def _load_disk_cache(name):
+    """
+    Membaca data dari cache disk, None jika tidak ada, kedaluwarsa, atau rusak
+    """
+    path = os.path.join(_DISK_CACHE_DIR, f"{name}.pkl")
+    try:
+        if time.time() - os.path.getmtime(path) > _DISK_CACHE_TTL.total_seconds():
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except OSError:
+        return None
+    except Exception:
+        # File rusak atau ditulis oleh versi library lain: anggap tidak ada cache dan hapus
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+def _save_disk_cache(name, data):
+    """
+    Menyimpan data ke cache disk (kegagalan menulis diabaikan)
+    """
+    path = os.path.join(_DISK_CACHE_DIR, f"{name}.pkl")
+    try:
+        os.makedirs(_DISK_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+# Cache info dan data keuangan per ticker agar setiap ticker hanya diunduh sekali per run.
+# lru_cache tidak menyimpan exception, sehingga ticker yang gagal akan dicoba lagi.
+@functools.lru_cache(maxsize=256)
+def get_info(ticker_symbol):
+    """
+    Mengambil info perusahaan dari Yahoo Finance dengan cache per ticker
+    """
+    info = _load_disk_cache(f"{ticker_symbol}_info")
+    if info is None:
+        info = yf.Ticker(ticker_symbol).info
+        _save_disk_cache(f"{ticker_symbol}_info", {k: v for k, v in info.items() if k not in _QUOTE_FIELDS})
+    return info
+
+@functools.lru_cache(maxsize=256)
+def _download_financial_data(ticker_symbol):
+    """
+    Mengunduh laporan keuangan dan info perusahaan (exception diteruskan ke pemanggil)
+    """
+    company = yf.Ticker(ticker_symbol)
+    
+    statements = _load_disk_cache(f"{ticker_symbol}_statements")
+    if statements is None:
+        statements = {
+            'income_stmt': company.income_stmt,
+            'balance_sheet': company.balance_sheet,
+            'cash_flow': company.cashflow
+        }
+        _save_disk_cache(f"{ticker_symbol}_statements", statements)
+    
+    return {
+        'company': company,
+        **statements,
+        'info': get_info(ticker_symbol)
+    }
 
 def get_financial_data(ticker_symbol):
     """
     Mengambil data keuangan perusahaan dari Yahoo Finance
     """
     try:
-        company = yf.Ticker(ticker_symbol)
-        
-        # Mendapatkan data historis
-        hist = company.history(period="1y")
-        
-        # Mendapatkan data keuangan
-        income_stmt = company.income_stmt
-        balance_sheet = company.balance_sheet
-        cash_flow = company.cashflow
-        
-        # Mendapatkan info perusahaan
-        info = company.info
-        
-        return {
-            'company': company,
-            'hist': hist,
-            'income_stmt': income_stmt,
-            'balance_sheet': balance_sheet,
-            'cash_flow': cash_flow,
-            'info': info
-        }
+        return _download_financial_data(ticker_symbol)
     except Exception as e:
         print(f"Error getting data: {e}")
         return None
 
-def dcf_valuation(financial_data, growth_rate=0.05, discount_rate=0.1, terminal_growth_rate=0.02, years=5):
+def _fetch_info(ticker):
     """
-    Melakukan valuasi dengan metode Discounted Cash Flow
+    Mengambil info satu ticker, mengembalikan (ticker, info) atau (ticker, None) jika gagal
     """
     try:
-        cash_flow = financial_data['cash_flow']
-        
-        # Mengambil Free Cash Flow terakhir
-        # Biasanya dihitung sebagai: Operating Cash Flow - Capital Expenditures
+        return ticker, get_info(ticker)
+    except Exception:
+        return ticker, None
+
+def _map_threaded(func, tickers):
+    """
+    Menjalankan func untuk setiap ticker secara paralel (I/O-bound) dengan urutan hasil tetap
+    """
+    with ThreadPoolExecutor(max_workers=min(32, max(1, len(tickers)))) as executor:
+        return list(executor.map(func, tickers))
+
+def _flatten_quote_summary(payload):
+    """
+    Mengubah respons quoteSummary menjadi dict datar seperti Ticker.info
+    """
+    info = {}
+    for module in payload['quoteSummary']['result'][0].values():
+        for key, value in module.items():
+            info[key] = value.get('raw') if isinstance(value, dict) else value
+    return info
+
+async def _get_crumb(session):
+    """
+    Mengambil cookie Yahoo lalu crumb yang wajib dikirim ke endpoint quoteSummary
+    """
+    # fc.yahoo.com hanya dipakai untuk mendapatkan cookie; status responsnya diabaikan
+    async with session.get(_YAHOO_COOKIE_URL, allow_redirects=False):
+        pass
+    async with session.get(_YAHOO_CRUMB_URL) as response:
+        response.raise_for_status()
+        return (await response.text()).strip()
+
+async def _fetch_summary(session, ticker, crumb):
+    """
+    Mengambil rasio satu ticker dari endpoint quoteSummary, (ticker, None) jika gagal
+    """
+    params = {'modules': _QUOTE_SUMMARY_MODULES, 'crumb': crumb}
+    try:
+        async with session.get(_QUOTE_SUMMARY_URL.format(ticker=ticker), params=params) as response:
+            response.raise_for_status()
+            return ticker, _flatten_quote_summary(await response.json())
+    except (aiohttp.ClientError, asyncio.TimeoutError, AttributeError, KeyError, IndexError, TypeError, ValueError):
+        return ticker, None
+
+async def _fetch_summaries(tickers):
+    """
+    Mengambil rasio semua ticker secara bersamaan dalam satu event loop dan satu connection pool
+    """
+    timeout = aiohttp.ClientTimeout(total=_ASYNC_TIMEOUT)
+    async with aiohttp.ClientSession(headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout) as session:
         try:
-            operating_cash_flow = cash_flow.loc['Operating Cash Flow'].iloc[-1]
-            capital_expenditures = cash_flow.loc['Capital Expenditure'].iloc[-1]
-            free_cash_flow = operating_cash_flow - abs(capital_expenditures)
-        except:
-            # Jika tidak tersedia, gunakan total kas operasi
-            free_cash_flow = cash_flow.loc['Operating Cash Flow'].iloc[-1]
-        
-        # Memproyeksikan free cash flow untuk masa depan
-        projected_cash_flows = []
-        for i in range(1, years + 1):
-            fcf = free_cash_flow * (1 + growth_rate) ** i
-            projected_cash_flows.append(fcf)
-        
-        # Menghitung Terminal Value
-        terminal_value = projected_cash_flows[-1] * (1 + terminal_growth_rate) / (discount_rate - terminal_growth_rate)
-        
-        # Menghitung Present Value dari setiap cash flow
-        present_values = [cf / (1 + discount_rate) ** (i+1) for i, cf in enumerate(projected_cash_flows)]
+            crumb = await _get_crumb(session)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            crumb = None
+        if not crumb:
+            return [(ticker, None) for ticker in tickers]
+        return await asyncio.gather(*(_fetch_summary(session, ticker, crumb) for ticker in tickers))
+
+def _in_event_loop():
+    """
+    Mengecek apakah kode sedang berjalan di dalam event loop (misalnya Jupyter)
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def fetch_peer_info(tickers):
+    """
+    Mengambil rasio perusahaan pembanding, mengembalikan list (ticker, info).
+    Ticker yang belum ada di cache diunduh bersamaan lewat quoteSummary (jika aiohttp
+    tersedia); ticker yang gagal diambil dari Ticker.info melalui thread pool.
+    """
+    unique = list(dict.fromkeys(tickers))
+    for ticker in unique:
+        if ticker not in _summary_cache:
+            summary = _load_disk_cache(f"{ticker}_summary")
+            if summary:
+                _summary_cache[ticker] = summary
+    
+    missing = [ticker for ticker in unique if ticker not in _summary_cache]
+    if missing and aiohttp is not None and not _in_event_loop():
+        for ticker, summary in asyncio.run(_fetch_summaries(missing)):
+            _summary_cache[ticker] = summary
+            if summary:
+                _save_disk_cache(f"{ticker}_summary", summary)
+    
+    fallback = [ticker for ticker in unique if not _summary_cache.get(ticker)]
+    infos = dict(_map_threaded(_fetch_info, fallback)) if fallback else {}
+    return [(ticker, _summary_cache.get(ticker) or infos.get(ticker)) for ticker in tickers]
+
+def _to_float(value):
+    """
+    Mengubah nilai info menjadi float, NaN jika kosong atau bukan angka
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _peer_ratios(results, key):
+    """
+    Mengambil rasio valid (positif dan berhingga) dari hasil info perusahaan pembanding
+    """
+    ratios = np.fromiter((_to_float((info or {}).get(key)) for _, info in results), dtype=np.float64, count=len(results))
+    return ratios[np.isfinite(ratios) & (ratios > 0)]
+
+def _last_column(statement):
+    """
+    Mengambil kolom terakhir laporan keuangan sebagai Series (kosong jika tidak ada data)
+    """
+    if statement is None or statement.empty:
+        return pd.Series(dtype=np.float64)
+    return statement.iloc[:, -1]
+
+def _cash_debt(bs_last):
+    """
+    Mengambil kas dan utang dari neraca, dengan data tambahan jika data spesifik tidak ada
+    """
+    cash = bs_last.get('Cash And Cash Equivalents', bs_last.get('Cash And Short Term Investments', 0))
+    debt = bs_last.get('Total Debt', bs_last.get('Long Term Debt', 0))
+    return cash, debt
+
+def build_context(financial_data):
+    """
+    Menyiapkan data bersama (saham beredar, kas, utang, kolom terakhir laporan keuangan)
+    yang dipakai oleh semua metode valuasi
+    """
+    info = financial_data['info']
+    bs_last = _last_column(financial_data['balance_sheet'])
+    cash, debt = _cash_debt(bs_last)
+    return {
+        'info': info,
+        'shares': info.get('sharesOutstanding') or 1,
+        'cash': cash,
+        'debt': debt,
+        'bs_last': bs_last,
+        'is_last': _last_column(financial_data['income_stmt']),
+        'cf_last': _last_column(financial_data['cash_flow'])
+    }
+
+def _equity_value(enterprise_value, ctx):
+    """
+    Mengubah Enterprise Value menjadi nilai ekuitas (ditambah kas, dikurangi utang)
+    """
+    return enterprise_value + ctx['cash'] - ctx['debt']
+
+def _multiples_values(target_metrics, ratios, ctx):
+    """
+    Menghitung nilai per saham untuk semua rasio _MULTIPLES sekaligus.
+    Rasio berbasis EV dikonversi dari Enterprise Value ke nilai ekuitas per saham.
+    """
+    values = target_metrics * ratios
+    return np.where(_IS_EV, _equity_value(values, ctx) / ctx['shares'], values)
+
+@functools.lru_cache(maxsize=128)
+def _growth_factors(g, years):
+    """
+    Faktor pertumbuhan (1+g)^n untuk n = 1..years (tuple agar aman disimpan di cache)
+    """
+    return tuple((1.0 + g) ** np.arange(1, years + 1, dtype=np.float64))
+
+@functools.lru_cache(maxsize=128)
+def _disc_factors(d, years):
+    """
+    Faktor diskonto 1/(1+d)^n untuk n = 1..years (tuple agar aman disimpan di cache)
+    """
+    return tuple(1.0 / (1.0 + d) ** np.arange(1, years + 1, dtype=np.float64))
+
+# Loop paralel pada kernel; diganti numba.prange oleh _jit saat numba tersedia
+prange = range
+
+@functools.lru_cache(maxsize=None)
+def _jit(func, parallel=False):
+    """
+    Mengompilasi func dengan numba saat pertama kali dipakai (import numba ditunda agar
+    startup tetap cepat). Tanpa numba, func dijalankan sebagai Python/NumPy biasa.
+    """
+    global prange
+    try:
+        import numba
+    except ImportError:
+        return func
+    prange = numba.prange
+    return numba.njit(cache=True, parallel=parallel)(func)
+
+def _dcf_projection(fcf, growth, disc, d, tg):
+    """
+    Kernel DCF: proyeksi cash flow, present value, terminal value dan Enterprise Value
+    dari FCF dan vektor faktor pertumbuhan/diskonto
+    """
+    projected = fcf * growth
+    present_values = projected * disc
+    terminal_value = projected[-1] * (1 + tg) / (d - tg)
+    enterprise_value = present_values.sum() + terminal_value * disc[-1]
+    return projected, present_values, terminal_value, enterprise_value
+
+def _dcf_ev_grid(fcf, growth, disc, ds, tg):
+    """
+    Kernel sweep DCF: Enterprise Value untuk setiap kombinasi baris growth (skenario growth)
+    dan baris disc (skenario discount rate ds), paralel per skenario growth
+    """
+    out = np.empty((growth.shape[0], disc.shape[0]))
+    for i in prange(growth.shape[0]):
+        for j in range(disc.shape[0]):
+            projected = fcf * growth[i]
+            terminal_value = projected[-1] * (1 + tg) / (ds[j] - tg)
+            out[i, j] = (projected * disc[j]).sum() + terminal_value * disc[j][-1]
+    return out
+
+def _check_dcf_params(discount_rate, terminal_growth_rate, years):
+    """
+    Memvalidasi parameter DCF sebelum kernel dipanggil (kernel numba tidak memeriksa batas array)
+    """
+    if years < 1:
+        raise ValueError("years harus minimal 1")
+    if discount_rate <= terminal_growth_rate:
+        raise ValueError("discount_rate harus lebih besar dari terminal_growth_rate")
+
+def _free_cash_flow(ctx):
+    """
+    Mengambil Free Cash Flow terakhir
+    """
+    cf_last = ctx['cf_last']
+    
+    # Biasanya dihitung sebagai: Operating Cash Flow - Capital Expenditures
+    # Jika Capital Expenditure tidak tersedia, gunakan total kas operasi
+    operating_cash_flow = cf_last['Operating Cash Flow']
+    capital_expenditures = cf_last.get('Capital Expenditure', 0)
+    return operating_cash_flow - abs(capital_expenditures)
+
+def dcf_valuation(ctx, growth_rate=0.05, discount_rate=0.1, terminal_growth_rate=0.02, years=5):
+    """
+    Melakukan valuasi dengan metode Discounted Cash Flow
+    """
+    try:
+        _check_dcf_params(discount_rate, terminal_growth_rate, years)
         
-        # Menghitung Present Value dari Terminal Value
-        present_value_terminal = terminal_value / (1 + discount_rate) ** years
+        free_cash_flow = _free_cash_flow(ctx)
         
-        # Total Enterprise Value
-        enterprise_value = sum(present_values) + present_value_terminal
+        # Memproyeksikan free cash flow untuk masa depan (vektor tahun 1..n), menghitung
+        # Present Value, Terminal Value dan Enterprise Value (PV cash flow + PV terminal value)
+        growth = np.asarray(_growth_factors(growth_rate, years))
+        disc = np.asarray(_disc_factors(discount_rate, years))
+        projected_cash_flows, present_values, terminal_value, enterprise_value = _jit(_dcf_projection)(
+            float(free_cash_flow), growth, disc, float(discount_rate), float(terminal_growth_rate)
+        )
         
         # Menghitung Equity Value
-        try:
-            cash = financial_data['balance_sheet'].loc['Cash And Cash Equivalents'].iloc[-1]
-            debt = financial_data['balance_sheet'].loc['Total Debt'].iloc[-1]
-        except:
-            # Jika tidak ada data spesifik, gunakan data tambahan
-            cash = financial_data['balance_sheet'].loc['Cash And Short Term Investments'].iloc[-1] if 'Cash And Short Term Investments' in financial_data['balance_sheet'].index else 0
-            debt = financial_data['balance_sheet'].loc['Long Term Debt'].iloc[-1] if 'Long Term Debt' in financial_data['balance_sheet'].index else 0
-        
-        equity_value = enterprise_value + cash - debt
+        equity_value = _equity_value(enterprise_value, ctx)
         
         # Menghitung nilai per saham
-        shares_outstanding = financial_data['info'].get('sharesOutstanding', 1)
-        dcf_value_per_share = equity_value / shares_outstanding
+        dcf_value_per_share = equity_value / ctx['shares']
         
         return {
             'enterprise_value': enterprise_value,
             'equity_value': equity_value,
             'dcf_value_per_share': dcf_value_per_share,
-            'projected_cash_flows': projected_cash_flows,
-            'present_values': present_values,
+            'projected_cash_flows': projected_cash_flows.tolist(),
+            'present_values': present_values.tolist(),
             'terminal_value': terminal_value
         }
     except Exception as e:
         print(f"Error in DCF valuation: {e}")
         return None
 
-def pe_valuation(financial_data, target_companies=None):
+def dcf_sensitivity(ctx, growth_rates, discount_rates, terminal_growth_rate=0.02, years=5):
+    """
+    Analisis sensitivitas DCF: nilai per saham untuk setiap kombinasi growth rate (baris)
+    dan discount rate (kolom), dihitung sekaligus dengan kernel paralel
+    """
+    try:
+        for discount_rate in discount_rates:
+            _check_dcf_params(discount_rate, terminal_growth_rate, years)
+        
+        # Faktor pertumbuhan/diskonto diambil dari cache per (rate, years)
+        growth = np.array([_growth_factors(g, years) for g in growth_rates], dtype=np.float64)
+        disc = np.array([_disc_factors(d, years) for d in discount_rates], dtype=np.float64)
+        ds = np.asarray(discount_rates, dtype=np.float64)
+        
+        enterprise_values = _jit(_dcf_ev_grid, parallel=True)(
+            float(_free_cash_flow(ctx)), growth, disc, ds, float(terminal_growth_rate)
+        )
+        return _equity_value(enterprise_values, ctx) / ctx['shares']
+    except Exception as e:
+        print(f"Error in DCF sensitivity analysis: {e}")
+        return None
+
+def pe_valuation(ctx, peer_infos=None):
     """
     Melakukan valuasi dengan metode Price to Earnings
     """
     try:
+        info = ctx['info']
+        
         # Mendapatkan EPS aktual perusahaan
-        eps = financial_data['info'].get('trailingEPS')
+        eps = info.get('trailingEPS')
         if not eps:
             # Jika tidak ada trailing EPS, hitung dari net income
-            income_stmt = financial_data['income_stmt']
-            net_income = income_stmt.loc['Net Income'].iloc[-1]
-            shares_outstanding = financial_data['info'].get('sharesOutstanding', 1)
-            eps = net_income / shares_outstanding
+            eps = ctx['is_last']['Net Income'] / ctx['shares']
         
         # Jika ada target perusahaan pembanding, gunakan rata-rata P/E mereka
-        if target_companies:
-            pe_ratios = []
-            for ticker in target_companies:
-                try:
-                    company = yf.Ticker(ticker)
-                    pe_ratio = company.info.get('trailingPE')
-                    if pe_ratio and pe_ratio > 0:
-                        pe_ratios.append(pe_ratio)
-                except:
-                    continue
+        if peer_infos:
+            pe_ratios = _peer_ratios(peer_infos, 'trailingPE')
             
-            if pe_ratios:
-                average_pe = sum(pe_ratios) / len(pe_ratios)
+            if pe_ratios.size:
+                average_pe = float(pe_ratios.mean())
             else:
                 # Jika tidak ada data pembanding, gunakan P/E perusahaan sendiri
-                average_pe = financial_data['info'].get('trailingPE', 15)  # Default P/E jika tidak ada data
+                average_pe = info.get('trailingPE', 15)  # Default P/E jika tidak ada data
         else:
             # Jika tidak ada perusahaan pembanding, gunakan P/E perusahaan sendiri
-            average_pe = financial_data['info'].get('trailingPE', 15)  # Default P/E jika tidak ada data
+            average_pe = info.get('trailingPE', 15)  # Default P/E jika tidak ada data
         
         # Menghitung nilai saham berdasarkan P/E
         pe_value_per_share = eps * average_pe
@@ -144,40 +465,31 @@ def pe_valuation(financial_data, target_companies=None):
         print(f"Error in P/E valuation: {e}")
         return None
 
-def pbv_valuation(financial_data, target_companies=None):
+def pbv_valuation(ctx, peer_infos=None):
     """
     Melakukan valuasi dengan metode Price to Book Value
     """
     try:
+        info = ctx['info']
+        
         # Mendapatkan Book Value per Share
-        bvps = financial_data['info'].get('bookValue')
+        bvps = info.get('bookValue')
         if not bvps:
             # Jika tidak ada book value per share, hitung dari total equity
-            balance_sheet = financial_data['balance_sheet']
-            total_equity = balance_sheet.loc['Total Stockholder Equity'].iloc[-1]
-            shares_outstanding = financial_data['info'].get('sharesOutstanding', 1)
-            bvps = total_equity / shares_outstanding
+            bvps = ctx['bs_last']['Total Stockholder Equity'] / ctx['shares']
         
         # Jika ada target perusahaan pembanding, gunakan rata-rata P/BV mereka
-        if target_companies:
-            pbv_ratios = []
-            for ticker in target_companies:
-                try:
-                    company = yf.Ticker(ticker)
-                    pbv_ratio = company.info.get('priceToBook')
-                    if pbv_ratio and pbv_ratio > 0:
-                        pbv_ratios.append(pbv_ratio)
-                except:
-                    continue
+        if peer_infos:
+            pbv_ratios = _peer_ratios(peer_infos, 'priceToBook')
             
-            if pbv_ratios:
-                average_pbv = sum(pbv_ratios) / len(pbv_ratios)
+            if pbv_ratios.size:
+                average_pbv = float(pbv_ratios.mean())
             else:
                 # Jika tidak ada data pembanding, gunakan P/BV perusahaan sendiri
-                average_pbv = financial_data['info'].get('priceToBook', 2)  # Default P/BV jika tidak ada data
+                average_pbv = info.get('priceToBook', 2)  # Default P/BV jika tidak ada data
         else:
             # Jika tidak ada perusahaan pembanding, gunakan P/BV perusahaan sendiri
-            average_pbv = financial_data['info'].get('priceToBook', 2)  # Default P/BV jika tidak ada data
+            average_pbv = info.get('priceToBook', 2)  # Default P/BV jika tidak ada data
         
         # Menghitung nilai saham berdasarkan P/BV
         pbv_value_per_share = bvps * average_pbv
@@ -191,63 +503,45 @@ def pbv_valuation(financial_data, target_companies=None):
         print(f"Error in P/BV valuation: {e}")
         return None
 
-def ev_ebitda_valuation(financial_data, target_companies=None):
+def ev_ebitda_valuation(ctx, peer_infos=None):
     """
     Melakukan valuasi dengan metode EV/EBITDA
     """
     try:
+        info = ctx['info']
+        is_last = ctx['is_last']
+        cf_last = ctx['cf_last']
+        
         # Menghitung EBITDA
-        income_stmt = financial_data['income_stmt']
-        try:
-            ebit = income_stmt.loc['EBIT'].iloc[-1]
-            try:
-                depreciation = income_stmt.loc['Depreciation And Amortization'].iloc[-1]
-            except:
-                depreciation = financial_data['cash_flow'].loc['Depreciation'].iloc[-1]
+        ebit = is_last.get('EBIT')
+        depreciation = is_last.get('Depreciation And Amortization', cf_last.get('Depreciation'))
+        if ebit is not None and depreciation is not None:
             ebitda = ebit + depreciation
-        except:
+        else:
             # Jika tidak ada EBIT, gunakan Income Before Tax + Interest Expense
-            ebitda = income_stmt.loc['Income Before Tax'].iloc[-1]
-            if 'Interest Expense' in income_stmt.index:
-                ebitda += abs(income_stmt.loc['Interest Expense'].iloc[-1])
+            ebitda = is_last['Income Before Tax'] + abs(is_last.get('Interest Expense', 0))
         
         # Jika ada target perusahaan pembanding, gunakan rata-rata EV/EBITDA mereka
-        if target_companies:
-            ev_ebitda_ratios = []
-            for ticker in target_companies:
-                try:
-                    company = yf.Ticker(ticker)
-                    ev_ebitda = company.info.get('enterpriseToEbitda')
-                    if ev_ebitda and ev_ebitda > 0:
-                        ev_ebitda_ratios.append(ev_ebitda)
-                except:
-                    continue
+        if peer_infos:
+            ev_ebitda_ratios = _peer_ratios(peer_infos, 'enterpriseToEbitda')
             
-            if ev_ebitda_ratios:
-                average_ev_ebitda = sum(ev_ebitda_ratios) / len(ev_ebitda_ratios)
+            if ev_ebitda_ratios.size:
+                average_ev_ebitda = float(ev_ebitda_ratios.mean())
             else:
                 # Jika tidak ada data pembanding, gunakan EV/EBITDA perusahaan sendiri
-                average_ev_ebitda = financial_data['info'].get('enterpriseToEbitda', 10)  # Default EV/EBITDA jika tidak ada data
+                average_ev_ebitda = info.get('enterpriseToEbitda', 10)  # Default EV/EBITDA jika tidak ada data
         else:
             # Jika tidak ada perusahaan pembanding, gunakan EV/EBITDA perusahaan sendiri
-            average_ev_ebitda = financial_data['info'].get('enterpriseToEbitda', 10)  # Default EV/EBITDA jika tidak ada data
+            average_ev_ebitda = info.get('enterpriseToEbitda', 10)  # Default EV/EBITDA jika tidak ada data
         
         # Menghitung Enterprise Value
         enterprise_value = ebitda * average_ev_ebitda
         
         # Menghitung Equity Value
-        try:
-            cash = financial_data['balance_sheet'].loc['Cash And Cash Equivalents'].iloc[-1]
-            debt = financial_data['balance_sheet'].loc['Total Debt'].iloc[-1]
-        except:
-            cash = financial_data['balance_sheet'].loc['Cash And Short Term Investments'].iloc[-1] if 'Cash And Short Term Investments' in financial_data['balance_sheet'].index else 0
-            debt = financial_data['balance_sheet'].loc['Long Term Debt'].iloc[-1] if 'Long Term Debt' in financial_data['balance_sheet'].index else 0
-        
-        equity_value = enterprise_value + cash - debt
+        equity_value = _equity_value(enterprise_value, ctx)
         
         # Menghitung nilai per saham
-        shares_outstanding = financial_data['info'].get('sharesOutstanding', 1)
-        ev_ebitda_value_per_share = equity_value / shares_outstanding
+        ev_ebitda_value_per_share = equity_value / ctx['shares']
         
         return {
             'ebitda': ebitda,
@@ -260,145 +554,52 @@ def ev_ebitda_valuation(financial_data, target_companies=None):
         print(f"Error in EV/EBITDA valuation: {e}")
         return None
 
-def market_multiples_valuation(ticker_symbol, target_companies):
+def market_multiples_valuation(ctx, peer_infos):
     """
     Melakukan valuasi dengan metode Comparable Companies (Market Multiples)
     """
     try:
-        # Mendapatkan data untuk perusahaan target
-        target_data = get_financial_data(ticker_symbol)
-        
-        # Mendapatkan data untuk perusahaan pembanding
-        comparable_data = {}
-        for ticker in target_companies:
-            data = get_financial_data(ticker)
-            if data:
-                comparable_data[ticker] = data
-        
-        # Mengumpulkan metrik valuasi dari perusahaan pembanding
-        metrics = {
-            'P/E': [],
-            'P/BV': [],
-            'EV/EBITDA': [],
-            'EV/Sales': []
-        }
+        info = ctx['info']
+        bs_last = ctx['bs_last']
+        is_last = ctx['is_last']
+        cf_last = ctx['cf_last']
         
-        for ticker, data in comparable_data.items():
-            try:
-                # P/E Ratio
-                pe_ratio = data['info'].get('trailingPE')
-                if pe_ratio and pe_ratio > 0:
-                    metrics['P/E'].append(pe_ratio)
-                
-                # P/BV Ratio
-                pbv_ratio = data['info'].get('priceToBook')
-                if pbv_ratio and pbv_ratio > 0:
-                    metrics['P/BV'].append(pbv_ratio)
-                
-                # EV/EBITDA
-                ev_ebitda = data['info'].get('enterpriseToEbitda')
-                if ev_ebitda and ev_ebitda > 0:
-                    metrics['EV/EBITDA'].append(ev_ebitda)
-                
-                # EV/Sales
-                ev_sales = data['info'].get('enterpriseToRevenue')
-                if ev_sales and ev_sales > 0:
-                    metrics['EV/Sales'].append(ev_sales)
-            except:
-                continue
-        
-        # Menghitung rata-rata metrik
+        # Merata-ratakan metrik valuasi dari perusahaan pembanding
         average_metrics = {}
-        for metric, values in metrics.items():
-            if values:
-                average_metrics[metric] = sum(values) / len(values)
-        
-        # Menghitung valuasi berdasarkan metrik rata-rata
-        valuations = {}
-        
-        # P/E valuation
-        if 'P/E' in average_metrics:
-            try:
-                eps = target_data['info'].get('trailingEPS')
-                if not eps:
-                    income_stmt = target_data['income_stmt']
-                    net_income = income_stmt.loc['Net Income'].iloc[-1]
-                    shares_outstanding = target_data['info'].get('sharesOutstanding', 1)
-                    eps = net_income / shares_outstanding
-                
-                valuations['P/E'] = eps * average_metrics['P/E']
-            except:
-                pass
-        
-        # P/BV valuation
-        if 'P/BV' in average_metrics:
-            try:
-                bvps = target_data['info'].get('bookValue')
-                if not bvps:
-                    balance_sheet = target_data['balance_sheet']
-                    total_equity = balance_sheet.loc['Total Stockholder Equity'].iloc[-1]
-                    shares_outstanding = target_data['info'].get('sharesOutstanding', 1)
-                    bvps = total_equity / shares_outstanding
-                
-                valuations['P/BV'] = bvps * average_metrics['P/BV']
-            except:
-                pass
+        for metric, key in _METRIC_KEYS.items():
+            peer_ratios = _peer_ratios(peer_infos, key)
+            if peer_ratios.size:
+                average_metrics[metric] = float(peer_ratios.mean())
+        
+        # Metrik perusahaan target untuk setiap rasio (NaN jika tidak tersedia)
+        eps = info.get('trailingEPS')
+        if not eps and 'Net Income' in is_last:
+            eps = is_last['Net Income'] / ctx['shares']
+        
+        bvps = info.get('bookValue')
+        if not bvps and 'Total Stockholder Equity' in bs_last:
+            bvps = bs_last['Total Stockholder Equity'] / ctx['shares']
+        
+        ebit = is_last.get('EBIT')
+        depreciation = is_last.get('Depreciation And Amortization', cf_last.get('Depreciation'))
+        if ebit is not None and depreciation is not None:
+            ebitda = ebit + depreciation
+        elif 'Income Before Tax' in is_last:
+            ebitda = is_last['Income Before Tax'] + abs(is_last.get('Interest Expense', 0))
+        else:
+            ebitda = np.nan
         
-        # EV/EBITDA valuation
-        if 'EV/EBITDA' in average_metrics:
-            try:
-                income_stmt = target_data['income_stmt']
-                try:
-                    ebit = income_stmt.loc['EBIT'].iloc[-1]
-                    try:
-                        depreciation = income_stmt.loc['Depreciation And Amortization'].iloc[-1]
-                    except:
-                        depreciation = target_data['cash_flow'].loc['Depreciation'].iloc[-1]
-                    ebitda = ebit + depreciation
-                except:
-                    ebitda = income_stmt.loc['Income Before Tax'].iloc[-1]
-                    if 'Interest Expense' in income_stmt.index:
-                        ebitda += abs(income_stmt.loc['Interest Expense'].iloc[-1])
-                
-                enterprise_value = ebitda * average_metrics['EV/EBITDA']
-                
-                try:
-                    cash = target_data['balance_sheet'].loc['Cash And Cash Equivalents'].iloc[-1]
-                    debt = target_data['balance_sheet'].loc['Total Debt'].iloc[-1]
-                except:
-                    cash = target_data['balance_sheet'].loc['Cash And Short Term Investments'].iloc[-1] if 'Cash And Short Term Investments' in target_data['balance_sheet'].index else 0
-                    debt = target_data['balance_sheet'].loc['Long Term Debt'].iloc[-1] if 'Long Term Debt' in target_data['balance_sheet'].index else 0
-                
-                equity_value = enterprise_value + cash - debt
-                shares_outstanding = target_data['info'].get('sharesOutstanding', 1)
-                
-                valuations['EV/EBITDA'] = equity_value / shares_outstanding
-            except:
-                pass
+        revenue = is_last.get('Total Revenue', np.nan)
         
-        # EV/Sales valuation
-        if 'EV/Sales' in average_metrics:
-            try:
-                revenue = target_data['income_stmt'].loc['Total Revenue'].iloc[-1]
-                enterprise_value = revenue * average_metrics['EV/Sales']
-                
-                try:
-                    cash = target_data['balance_sheet'].loc['Cash And Cash Equivalents'].iloc[-1]
-                    debt = target_data['balance_sheet'].loc['Total Debt'].iloc[-1]
-                except:
-                    cash = target_data['balance_sheet'].loc['Cash And Short Term Investments'].iloc[-1] if 'Cash And Short Term Investments' in target_data['balance_sheet'].index else 0
-                    debt = target_data['balance_sheet'].loc['Long Term Debt'].iloc[-1] if 'Long Term Debt' in target_data['balance_sheet'].index else 0
-                
-                equity_value = enterprise_value + cash - debt
-                shares_outstanding = target_data['info'].get('sharesOutstanding', 1)
-                
-                valuations['EV/Sales'] = equity_value / shares_outstanding
-            except:
-                pass
+        # Menghitung valuasi berdasarkan metrik rata-rata untuk semua rasio sekaligus
+        target_metrics = np.array([_to_float(eps) or np.nan, _to_float(bvps) or np.nan, ebitda, revenue], dtype=np.float64)
+        ratios = np.array([average_metrics.get(metric, np.nan) for metric in _MULTIPLES], dtype=np.float64)
+        values = _multiples_values(target_metrics, ratios, ctx)
+        valuations = {metric: float(value) for metric, value in zip(_MULTIPLES, values) if np.isfinite(value)}
         
         # Menghitung nilai rata-rata dari semua metrik
         if valuations:
-            average_valuation = sum(valuations.values()) / len(valuations)
+            average_valuation = float(values[np.isfinite(values)].mean())
         else:
             average_valuation = None
         
@@ -421,10 +622,18 @@ def perform_valuation(ticker_symbol, target_companies=None):
     if not financial_data:
         return None
     
+    # Info perusahaan pembanding diunduh sekali dan dipakai oleh semua metode;
+    # ticker pembanding yang sama hanya diunduh dan dihitung sekali
+    peer_infos = None
+    if target_companies:
+        peer_infos = fetch_peer_info(list(dict.fromkeys(target_companies)))
+    
     # Mendapatkan harga saham saat ini
     current_price = financial_data['info'].get('currentPrice')
     if not current_price:
-        current_price = financial_data['hist']['Close'].iloc[-1]
+        # Jika tidak ada di info (misalnya info dibaca dari cache disk yang tidak menyimpan
+        # harga real-time), ambil harga terakhir dari data historis singkat
+        current_price = financial_data['company'].history(period="5d")['Close'].iloc[-1]
     
     # Melakukan valuasi dengan berbagai metode
     valuations = {
@@ -433,39 +642,65 @@ def perform_valuation(ticker_symbol, target_companies=None):
         'company_name': financial_data['info'].get('longName', ticker_symbol)
     }
     
+    # Data bersama untuk semua metode valuasi
+    ctx = build_context(financial_data)
+    
     # DCF Valuation
-    dcf_result = dcf_valuation(financial_data)
+    dcf_result = dcf_valuation(ctx)
     if dcf_result:
         valuations['DCF'] = dcf_result['dcf_value_per_share']
     
     # P/E Valuation
-    pe_result = pe_valuation(financial_data, target_companies)
+    pe_result = pe_valuation(ctx, peer_infos)
     if pe_result:
         valuations['P/E'] = pe_result['pe_value_per_share']
     
     # P/BV Valuation
-    pbv_result = pbv_valuation(financial_data, target_companies)
+    pbv_result = pbv_valuation(ctx, peer_infos)
     if pbv_result:
         valuations['P/BV'] = pbv_result['pbv_value_per_share']
     
     # EV/EBITDA Valuation
-    ev_ebitda_result = ev_ebitda_valuation(financial_data, target_companies)
+    ev_ebitda_result = ev_ebitda_valuation(ctx, peer_infos)
     if ev_ebitda_result:
         valuations['EV/EBITDA'] = ev_ebitda_result['ev_ebitda_value_per_share']
     
     # Market Multiples Valuation (jika ada perusahaan pembanding)
-    if target_companies:
-        mm_result = market_multiples_valuation(ticker_symbol, target_companies)
+    if peer_infos:
+        mm_result = market_multiples_valuation(ctx, peer_infos)
         if mm_result and mm_result['average_valuation']:
             valuations['Market Multiples'] = mm_result['average_valuation']
     
     # Menghitung nilai rata-rata dari semua metode
-    valuation_methods = [v for k, v in valuations.items() if k not in ['ticker', 'current_price', 'company_name']]
-    if valuation_methods:
-        valuations['Average'] = sum(valuation_methods) / len(valuation_methods)
+    valuation_methods = np.fromiter((v for k, v in valuations.items() if k not in _NON_METRIC), dtype=np.float64)
+    if valuation_methods.size:
+        valuations['Average'] = float(valuation_methods.mean())
     
     return valuations
 
+# Backend matplotlib yang hanya menulis file dan tidak bisa menampilkan grafik
+_NON_INTERACTIVE_BACKENDS = frozenset({'agg', 'cairo', 'pdf', 'pgf', 'ps', 'svg', 'template'})
+
+def _is_interactive():
+    """
+    Mengecek apakah backend matplotlib yang aktif bisa menampilkan grafik
+    (GUI di X11/Wayland/Windows/macOS atau inline di Jupyter)
+    """
+    import matplotlib
+    return matplotlib.get_backend().lower() not in _NON_INTERACTIVE_BACKENDS
+
+@functools.lru_cache(maxsize=1)
+def _batch_figure():
+    """
+    Figure Agg tunggal yang dipakai ulang untuk mode batch (tanpa GUI)
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    fig = Figure(figsize=(12, 8))
+    FigureCanvasAgg(fig)
+    return fig
+
 def display_valuation_results(valuations):
     """
     Menampilkan hasil valuasi dalam bentuk tabel dan grafik
@@ -480,7 +715,7 @@ def display_valuation_results(valuations):
     print(f"Harga Saat Ini: ${valuations['current_price']:.2f}")
     print("\nMetode Valuasi:")
     
-    methods = [k for k in valuations.keys() if k not in ['ticker', 'current_price', 'company_name']]
+    methods = [k for k in valuations.keys() if k not in _NON_METRIC]
     
     for method in methods:
         value = valuations[method]
@@ -488,28 +723,36 @@ def display_valuation_results(valuations):
         status = "UNDERVALUED" if diff > 0 else "OVERVALUED"
         print(f"{method}: ${value:.2f} ({diff:.2f}% {status})")
     
-    # Membuat grafik perbandingan
-    plt.figure(figsize=(12, 8))
+    # Membuat grafik perbandingan. Matplotlib di-import hanya saat grafik dibuat;
+    # tanpa display, grafik langsung dirender dengan Agg tanpa membuka GUI.
+    interactive = _is_interactive()
+    if interactive:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(12, 8))
+    else:
+        fig = _batch_figure()
+        fig.clear()
+        ax = fig.subplots()
     
     values = [valuations[method] for method in methods]
     colors = ['green' if v > valuations['current_price'] else 'red' for v in values]
     
-    plt.bar(methods, values, color=colors)
-    plt.axhline(y=valuations['current_price'], color='blue', linestyle='-', label=f'Harga Saat Ini (${valuations["current_price"]:.2f})')
+    bars = ax.bar(methods, values, color=colors)
+    ax.axhline(y=valuations['current_price'], color='blue', linestyle='-', label=f'Harga Saat Ini (${valuations["current_price"]:.2f})')
     
-    plt.title(f"Valuasi Perusahaan - {valuations['company_name']} ({valuations['ticker']})")
-    plt.xlabel("Metode Valuasi")
-    plt.ylabel("Nilai per Saham ($)")
-    plt.legend()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.set_title(f"Valuasi Perusahaan - {valuations['company_name']} ({valuations['ticker']})")
+    ax.set_xlabel("Metode Valuasi")
+    ax.set_ylabel("Nilai per Saham ($)")
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Menambahkan nilai di atas bar
-    for i, v in enumerate(values):
-        plt.text(i, v + 0.5, f"${v:.2f}", ha='center', fontweight='bold')
+    ax.bar_label(bars, labels=[f"${v:.2f}" for v in values], padding=3, fontweight='bold')
     
-    plt.tight_layout()
-    plt.savefig(f"{valuations['ticker']}_valuation.png")
-    plt.show()
+    fig.tight_layout()
+    fig.savefig(f"{valuations['ticker']}_valuation.png")
+    if interactive:
+        plt.show()
 
 def main():
     print("=== PROGRAM VALUASI PERUSAHAAN ===")